@@ -5,74 +5,134 @@ Command-line interface for the agentic-note tool.
 import argparse
 import os
 import sys
-import textwrap
-from typing import List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional
 
-from .note import NoteManager
+if TYPE_CHECKING:
+    from .note import NoteManager
 
 
-def create_parser() -> argparse.ArgumentParser:
-    """Create the command-line argument parser."""
+def _add_create_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the arguments of the create command."""
+    parser.add_argument("title", help="Title of the note")
+    parser.add_argument("content", help="Content of the note")
+    parser.add_argument("--tags", help="Comma-separated list of tags")
+
+
+def _add_list_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the arguments of the list command."""
+    parser.add_argument("--tag", help="Filter notes by tag")
+
+
+def _add_view_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the arguments of the view command."""
+    parser.add_argument("id", help="ID of the note to view")
+
+
+def _add_update_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the arguments of the update command."""
+    parser.add_argument("id", help="ID of the note to update")
+    parser.add_argument("--title", help="New title for the note")
+    parser.add_argument("--content", help="New content for the note")
+    parser.add_argument("--tags", help="Comma-separated list of tags")
+
+
+def _add_delete_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the arguments of the delete command."""
+    parser.add_argument("id", help="ID of the note to delete")
+
+
+def _add_search_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the arguments of the search command."""
+    parser.add_argument("query", help="Search query")
+
+
+# Command name -> (help text, function adding its arguments), in listing order
+_COMMANDS = {
+    "create": ("Create a new note", _add_create_arguments),
+    "list": ("List notes", _add_list_arguments),
+    "view": ("View a note", _add_view_arguments),
+    "update": ("Update a note", _add_update_arguments),
+    "delete": ("Delete a note", _add_delete_arguments),
+    "search": ("Search notes", _add_search_arguments),
+}
+
+
+# Usage examples shown after the help text, written out already dedented
+_EPILOG = """
+Examples:
+  # Create a new note
+  ag note create "Note Title" "Note content goes here" --tags tag1,tag2
+
+  # List all notes
+  ag note list
+
+  # List notes with a specific tag
+  ag note list --tag tag1
+
+  # View a note
+  ag note view note-id
+
+  # Update a note
+  ag note update note-id --title "New Title" --content "New content" --tags tag1,tag3
+
+  # Delete a note
+  ag note delete note-id
+
+  # Search notes
+  ag note search "query"
+"""
+
+
+def _sniff_subcommand(argv: List[str]) -> Optional[str]:
+    """
+    Return the command named in argv, if any.
+    
+    There are no top-level options besides help, so a command can only come
+    first. Anything else returns None, even with a command name further on,
+    so that the full parser reports the mistake against every command.
+    """
+    if argv and argv[0] in _COMMANDS:
+        return argv[0]
+    return None
+
+
+def _build_parser(only: Optional[str] = None,
+                  with_arguments: bool = True) -> argparse.ArgumentParser:
+    """Build the parser, with the subparsers of one or all commands."""
     parser = argparse.ArgumentParser(
         description="Agentic Note - Agent's notebook providing note-taking capabilities",
         formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog=textwrap.dedent("""
-        Examples:
-          # Create a new note
-          ag note create "Note Title" "Note content goes here" --tags tag1,tag2
-          
-          # List all notes
-          ag note list
-          
-          # List notes with a specific tag
-          ag note list --tag tag1
-          
-          # View a note
-          ag note view note-id
-          
-          # Update a note
-          ag note update note-id --title "New Title" --content "New content" --tags tag1,tag3
-          
-          # Delete a note
-          ag note delete note-id
-          
-          # Search notes
-          ag note search "query"
-        """)
+        epilog=_EPILOG
     )
     
     subparsers = parser.add_subparsers(dest="command", help="Command to execute")
     
-    # Create command
-    create_parser = subparsers.add_parser("create", help="Create a new note")
-    create_parser.add_argument("title", help="Title of the note")
-    create_parser.add_argument("content", help="Content of the note")
-    create_parser.add_argument("--tags", help="Comma-separated list of tags")
-    
-    # List command
-    list_parser = subparsers.add_parser("list", help="List notes")
-    list_parser.add_argument("--tag", help="Filter notes by tag")
-    
-    # View command
-    view_parser = subparsers.add_parser("view", help="View a note")
-    view_parser.add_argument("id", help="ID of the note to view")
-    
-    # Update command
-    update_parser = subparsers.add_parser("update", help="Update a note")
-    update_parser.add_argument("id", help="ID of the note to update")
-    update_parser.add_argument("--title", help="New title for the note")
-    update_parser.add_argument("--content", help="New content for the note")
-    update_parser.add_argument("--tags", help="Comma-separated list of tags")
+    for name, (help_text, add_arguments) in _COMMANDS.items():
+        if only is None or name == only:
+            command_parser = subparsers.add_parser(name, help=help_text)
+            if with_arguments:
+                add_arguments(command_parser)
     
-    # Delete command
-    delete_parser = subparsers.add_parser("delete", help="Delete a note")
-    delete_parser.add_argument("id", help="ID of the note to delete")
+    return parser
+
+
+def create_parser(only: Optional[str] = None) -> argparse.ArgumentParser:
+    """
+    Create the command-line argument parser.
     
-    # Search command
-    search_parser = subparsers.add_parser("search", help="Search notes")
-    search_parser.add_argument("query", help="Search query")
+    If only is given, just that command's subparser is built.
+    """
+    return _build_parser(only)
+
+
+def create_help_parser() -> argparse.ArgumentParser:
+    """
+    Create a parser that is only good for printing the top-level help.
     
-    return parser
+    Every command is listed with its help text, but their arguments are not
+    added since the top-level help does not show them.
+    """
+    return _build_parser(with_arguments=False)
 
 
 def parse_tags(tags_str: Optional[str]) -> Optional[List[str]]:
@@ -117,75 +177,112 @@ def format_note(note) -> str:
     return "\n".join(result)
 
 
+def _storage_dir(agentic_home: Optional[str]) -> str:
+    """Get the notes directory for the given AGHOME value."""
+    if agentic_home is None:
+        agentic_home = os.path.expanduser("~/Agentic")
+    return os.path.join(agentic_home, "shared", "notes")
+
+
+# Note managers by storage directory, reused by later commands in the process
+_MANAGER_CACHE: Dict[str, "NoteManager"] = {}
+
+
+def _get_manager(storage_dir: str) -> "NoteManager":
+    """
+    Get the note manager for a storage directory, creating it once.
+    
+    The manager keeps its loaded index between commands, and is only replaced
+    once another process has rewritten the index file.
+    """
+    # Deferred so that help and usage errors never pay for the note module
+    from .note import NoteManager
+    
+    note_manager = _MANAGER_CACHE.get(storage_dir)
+    if note_manager is None or note_manager._changed_on_disk():
+        note_manager = _MANAGER_CACHE[storage_dir] = NoteManager(storage_dir)
+    
+    return note_manager
+
+
 def process_command(args) -> int:
     """Process the command with the given arguments."""
     if not args.command:
-        create_parser().print_help()
+        create_help_parser().print_help()
         return 1
     
-    # Initialize the note manager
-    agentic_home = os.environ.get("AGHOME", os.path.expanduser("~/Agentic"))
-    storage_dir = os.path.join(agentic_home, "shared", "notes")
-    note_manager = NoteManager(storage_dir)
-    
-    # Execute the requested command
-    if args.command == "create":
-        tags = parse_tags(args.tags)
-        note = note_manager.create_note(args.title, args.content, tags)
-        print(f"Note created with ID: {note.id}")
-        return 0
-    
-    elif args.command == "list":
-        notes = note_manager.list_notes(args.tag)
-        print(format_note_list(notes))
-        return 0
-    
-    elif args.command == "view":
-        note = note_manager.get_note(args.id)
-        if note:
-            print(format_note(note))
-            return 0
-        else:
-            print(f"Note with ID {args.id} not found.")
-            return 1
-    
-    elif args.command == "update":
-        tags = parse_tags(args.tags) if args.tags is not None else None
-        note = note_manager.update_note(args.id, args.title, args.content, tags)
-        if note:
-            print(f"Note {args.id} updated successfully.")
-            return 0
-        else:
-            print(f"Note with ID {args.id} not found.")
-            return 1
-    
-    elif args.command == "delete":
-        success = note_manager.delete_note(args.id)
-        if success:
-            print(f"Note {args.id} deleted successfully.")
+    # Get the note manager
+    note_manager = _get_manager(_storage_dir(os.environ.get("AGHOME")))
+    
+    # Execute the requested command, writing the index at most once
+    with note_manager.batch():
+        if args.command == "create":
+            tags = parse_tags(args.tags)
+            note = note_manager.create_note(args.title, args.content, tags)
+            print(f"Note created with ID: {note.id}")
             return 0
-        else:
-            print(f"Note with ID {args.id} not found.")
-            return 1
-    
-    elif args.command == "search":
-        notes = note_manager.search_notes(args.query)
-        if notes:
-            print(f"Found {len(notes)} notes matching '{args.query}':")
+        
+        elif args.command == "list":
+            notes = note_manager.list_notes(args.tag)
             print(format_note_list(notes))
             return 0
-        else:
-            print(f"No notes found matching '{args.query}'.")
-            return 0
+        
+        elif args.command == "view":
+            note = note_manager.get_note(args.id)
+            if note:
+                print(format_note(note))
+                return 0
+            else:
+                print(f"Note with ID {args.id} not found.")
+                return 1
+        
+        elif args.command == "update":
+            tags = parse_tags(args.tags) if args.tags is not None else None
+            note = note_manager.update_note(args.id, args.title, args.content, tags)
+            if note:
+                print(f"Note {args.id} updated successfully.")
+                return 0
+            else:
+                print(f"Note with ID {args.id} not found.")
+                return 1
+        
+        elif args.command == "delete":
+            success = note_manager.delete_note(args.id)
+            if success:
+                print(f"Note {args.id} deleted successfully.")
+                return 0
+            else:
+                print(f"Note with ID {args.id} not found.")
+                return 1
+        
+        elif args.command == "search":
+            notes = note_manager.search_notes(args.query)
+            if notes:
+                print(f"Found {len(notes)} notes matching '{args.query}':")
+                print(format_note_list(notes))
+                return 0
+            else:
+                print(f"No notes found matching '{args.query}'.")
+                return 0
+        
+        return 1
+
+
+def _run(argv: List[str]) -> int:
+    """Parse the command-line arguments and run the command."""
+    # Plain help needs no command arguments, so skip building them
+    if all(arg in ("-h", "--help") for arg in argv):
+        create_help_parser().print_help()
+        return 0 if argv else 1
     
-    return 1
+    parser = create_parser(_sniff_subcommand(argv))
+    args = parser.parse_args(argv)
+    return process_command(args)
 
 
 def main() -> int:
     """Main entry point for the CLI."""
-    parser = create_parser()
-    args = parser.parse_args()
-    return process_command(args)
+    return _run(sys.argv[1:])
 
 
 def note_command() -> int:
@@ -197,9 +294,7 @@ def note_command() -> int:
     2. Returns an integer exit code (0 for success, non-zero for failure)
     3. Handles its own argument parsing
     """
-    parser = create_parser()
-    args = parser.parse_args(sys.argv[1:])
-    return process_command(args)
+    return _run(sys.argv[1:])
 
 
 if __name__ == "__main__":
@@ -2,16 +2,270 @@
 Core module for note-taking functionality.
 """
 
+import atexit
+import bisect
 import datetime
+import itertools
 import json
+import mmap
 import os
 import pathlib
+import re
+import sys
+import time
 import uuid
-from dataclasses import asdict, dataclass
-from typing import Dict, List, Optional, Union
+import weakref
+from collections.abc import Mapping
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
 
-@dataclass
+
+def _loads(data: bytes) -> Any:
+    """Parse JSON, using orjson when it is available."""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # orjson rejects the escaped lone surrogates the stdlib writes
+            pass
+    return json.loads(data)
+
+
+def _dumps(data: Any, indent: bool = True) -> bytes:
+    """
+    Serialize data to JSON, using orjson when it is available.
+    
+    Lone surrogates, which command-line arguments that are not valid UTF-8
+    decode to, cannot be encoded as UTF-8. Data holding them is written with
+    every character outside ASCII escaped instead.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0)
+        except TypeError:
+            pass
+    
+    options = {"indent": 2} if indent else {"separators": (",", ":")}
+    try:
+        return json.dumps(data, ensure_ascii=False, **options).encode("utf-8")
+    except UnicodeEncodeError:
+        return json.dumps(data, **options).encode("ascii")
+
+
+def _read_json(path: pathlib.Path) -> Any:
+    """Read a JSON file, using orjson when it is available."""
+    return _loads(path.read_bytes())
+
+
+def _write_json(path: pathlib.Path, data: Any, indent: bool = True) -> None:
+    """
+    Write data to a JSON file atomically.
+    
+    The data is written to a temporary file that then replaces path, so a
+    crash mid-write never leaves a truncated file behind. Large files nobody
+    reads by hand are written without indentation. The temporary file is
+    named after the process, so processes writing the same file at once
+    never write to or move each other's.
+    """
+    payload = _dumps(data, indent)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        tmp_path.write_bytes(payload)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            tmp_path.unlink()
+        except FileNotFoundError:
+            pass
+        raise
+
+
+FileStamp = Tuple[int, int, int]
+
+
+def _file_stamp(path: pathlib.Path) -> Optional[FileStamp]:
+    """Get a stamp that changes whenever the file is rewritten."""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+# Managers whose deferred index changes are written when the process exits
+_MANAGERS: "weakref.WeakSet[NoteManager]" = weakref.WeakSet()
+
+
+def _flush_managers() -> None:
+    """Write the deferred index changes of the managers still alive."""
+    for manager in list(_MANAGERS):
+        manager.flush()
+
+
+atexit.register(_flush_managers)
+
+
+def _raw_json_bytes(text: str) -> Optional[bytes]:
+    """
+    Get the bytes text is stored as inside a JSON string, if they are plain.
+    
+    Returns None for text with characters that JSON escapes, since their
+    stored form depends on the writer.
+    """
+    if any(char in '"\\' or char < " " for char in text):
+        return None
+    
+    # Lone surrogates are never stored as they are
+    try:
+        return text.encode("utf-8")
+    except UnicodeEncodeError:
+        return None
+
+
+def _content_pattern(query: str) -> Optional["re.Pattern[bytes]"]:
+    """
+    Get a pattern for ruling out content matches in raw note file bytes.
+    
+    The pattern finds the lowercased query in any ASCII case. It also finds
+    U+0130 and U+212A, the only characters outside ASCII that lowercase to
+    ASCII letters, and the escapes JSON may store any character as. Returns
+    None for queries outside ASCII or with characters that JSON escapes.
+    """
+    query_bytes = _raw_json_bytes(query)
+    if query_bytes is None or not query_bytes.isascii():
+        return None
+    return re.compile(
+        re.escape(query_bytes) + rb"|\xc4\xb0|\xe2\x84\xaa|\\u", re.IGNORECASE
+    )
+
+
+_TERM_SEPARATOR = re.compile(r"\W+")
+
+# Common words left out of the search index
+_STOPWORDS = frozenset({
+    "an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "if",
+    "in", "into", "is", "it", "its", "not", "of", "on", "or", "so", "such",
+    "that", "the", "their", "then", "there", "these", "they", "this", "to",
+    "was", "were", "will", "with",
+})
+
+
+def _tokenize(text: str) -> Set[str]:
+    """Split text into the lowercase terms kept in the search index."""
+    return {
+        term for term in _TERM_SEPARATOR.split(text.lower())
+        if len(term) > 1 and term not in _STOPWORDS
+    }
+
+
+def _query_words(query: str) -> Set[str]:
+    """
+    Get the words of a query that can narrow a search down.
+    
+    Words that could be hidden inside a stopword are not indexed reliably, so
+    they are left out.
+    """
+    return {
+        word for word in _tokenize(query)
+        if not any(word in stopword for stopword in _STOPWORDS)
+    }
+
+
+def _import_ahocorasick() -> Any:
+    """
+    Import pyahocorasick, or get None if it is not installed.
+    
+    Only searches use it, so it is imported when first needed rather than
+    along with this module.
+    """
+    try:
+        import ahocorasick
+    except ImportError:  # pragma: no cover - optional speedup
+        return None
+    return ahocorasick
+
+
+def _substring_finder(words: Set[str]) -> Callable[[str], Iterable[Tuple[int, str]]]:
+    """
+    Build a function finding every occurrence of the words in a text.
+    
+    Each occurrence is given as the index it ends at and the word. Uses an
+    Aho-Corasick automaton when pyahocorasick is installed, so each text is
+    scanned once however many words there are. Words must not be empty.
+    """
+    ahocorasick = _import_ahocorasick()
+    if ahocorasick is None or not words:
+        def find(text: str) -> Iterator[Tuple[int, str]]:
+            for word in words:
+                start = text.find(word)
+                while start != -1:
+                    yield start + len(word) - 1, word
+                    start = text.find(word, start + 1)
+        
+        return find
+    
+    automaton = ahocorasick.Automaton()
+    for word in words:
+        automaton.add_word(word, word)
+    automaton.make_automaton()
+    return automaton.iter
+
+
+def _substring_matcher(patterns: Set[str]) -> Callable[[str], Set[str]]:
+    """
+    Build a function finding which of the patterns occur in a text.
+    
+    Uses an Aho-Corasick automaton when pyahocorasick is installed, so each
+    text is scanned once however many patterns there are.
+    """
+    if _import_ahocorasick() is None:
+        return lambda text: {pattern for pattern in patterns if pattern in text}
+    
+    # The empty pattern occurs in every text but is not a valid key
+    always = {pattern for pattern in patterns if not pattern}
+    find = _substring_finder(patterns - always)
+    return lambda text: always | {word for _, word in find(text)}
+
+
+def _new_id() -> str:
+    """
+    Generate the ID of a new note as a version 7 UUID.
+    
+    The first 48 bits hold the creation time in milliseconds, so IDs sort in
+    the order notes were created; the rest is random.
+    """
+    timestamp_ms = time.time_ns() // 1_000_000
+    random_bits = int.from_bytes(os.urandom(10), "big")
+    value = (timestamp_ms & 0xFFFFFFFFFFFF) << 80 | random_bits
+    
+    # Set the version (7) and variant (RFC 4122) fields
+    value = (value & ~(0xF << 76)) | (0x7 << 76)
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)
+    return str(uuid.UUID(int=value))
+
+
+# Slotted dataclasses need Python 3.10; older versions keep a __dict__
+_DATACLASS_OPTIONS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(**_DATACLASS_OPTIONS)
 class Note:
     """Represents a single note."""
     
@@ -24,19 +278,21 @@ class Note:
     
     def __post_init__(self):
         """Initialize default values for a new note."""
-        now = datetime.datetime.now().isoformat()
-        
         if self.tags is None:
             self.tags = []
+        
+        # Notes loaded from disk already have both timestamps
+        if self.created_at is None or self.updated_at is None:
+            now = datetime.datetime.now().isoformat()
             
-        if self.created_at is None:
-            self.created_at = now
-            
-        if self.updated_at is None:
-            self.updated_at = now
+            if self.created_at is None:
+                self.created_at = now
+                
+            if self.updated_at is None:
+                self.updated_at = now
             
         if self.id is None:
-            self.id = str(uuid.uuid4())
+            self.id = _new_id()
     
     def update(self, title: Optional[str] = None, content: Optional[str] = None, 
                tags: Optional[List[str]] = None) -> None:
@@ -54,7 +310,14 @@ class Note:
     
     def to_dict(self) -> Dict:
         """Convert the note to a dictionary."""
-        return asdict(self)
+        return {
+            "title": self.title,
+            "content": self.content,
+            "tags": list(self.tags),
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "id": self.id
+        }
     
     @classmethod
     def from_dict(cls, data: Dict) -> 'Note':
@@ -62,6 +325,148 @@ class Note:
         return cls(**data)
 
 
+class _TermIndex(Mapping):
+    """
+    The IDs of the notes containing each search term.
+    
+    Notes are numbered in the order they are first indexed, and each term
+    keeps the numbers of its notes. Posting lists are stored as
+    space-separated strings, which load many times faster than lists of IDs,
+    and only the terms a search reads are decoded. Changes are kept apart, as
+    the numbers added to or removed from each term, so they never decode or
+    rescan a whole list; they are folded into the strings when the index is
+    stored. Deleted notes leave their numbers unused until they outnumber the
+    notes left, when the notes are numbered afresh.
+    """
+    
+    def __init__(self, postings: Optional[Dict[str, str]] = None,
+                 ids: Optional[List[Optional[str]]] = None):
+        """Initialize the index from its posting lists and numbered note IDs."""
+        self.postings = postings if postings is not None else {}
+        self.ids = ids if ids is not None else []
+        self.numbers = {
+            note_id: number for number, note_id in enumerate(self.ids)
+            if note_id is not None
+        }
+        
+        # Term -> note number -> whether the note was added or removed since
+        self._changes: Dict[str, Dict[int, bool]] = {}
+    
+    def _numbers_of(self, term: str) -> Iterable[int]:
+        """Get the numbers of the notes containing a term."""
+        numbers = map(int, self.postings[term].split())
+        changes = self._changes.get(term)
+        if changes is None:
+            return numbers
+        
+        kept = {number for number in numbers if changes.get(number, True)}
+        kept.update(number for number, added in changes.items() if added)
+        return kept
+    
+    def __getitem__(self, term: str) -> List[str]:
+        """Get the IDs of the notes containing a term."""
+        note_ids = (self.ids[number] for number in self._numbers_of(term))
+        found = [note_id for note_id in note_ids if note_id is not None]
+        if not found:
+            raise KeyError(term)
+        return found
+    
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the terms."""
+        return (
+            term for term in self.postings
+            if term not in self._changes or self._numbers_of(term)
+        )
+    
+    def __len__(self) -> int:
+        """Count the terms."""
+        return sum(1 for _ in self)
+    
+    def vocabulary(self) -> List[str]:
+        """
+        List the terms without decoding any posting list.
+        
+        Terms whose notes were all removed since the index was loaded may be
+        listed too.
+        """
+        return list(self.postings)
+    
+    def add(self, note_id: str, terms: Iterable[str]) -> None:
+        """Add a note to the posting lists of the given terms."""
+        number = self.numbers.get(note_id)
+        if number is None:
+            number = self.numbers[note_id] = len(self.ids)
+            self.ids.append(note_id)
+        
+        for term in terms:
+            self.postings.setdefault(term, "")
+            self._changes.setdefault(term, {})[number] = True
+    
+    def remove(self, note_id: str, terms: Iterable[str]) -> None:
+        """Remove a note from the posting lists of the given terms."""
+        number = self.numbers.get(note_id)
+        if number is None:
+            return
+        
+        for term in terms:
+            if term in self.postings:
+                self._changes.setdefault(term, {})[number] = False
+    
+    def forget(self, note_id: str) -> None:
+        """Release the number of a deleted note."""
+        number = self.numbers.pop(note_id, None)
+        if number is not None:
+            self.ids[number] = None
+    
+    def terms_of(self, note_id: str) -> List[str]:
+        """Find the terms of a note by looking through every posting list."""
+        number = self.numbers.get(note_id)
+        if number is None:
+            return []
+        
+        padded = f" {number} "
+        return [
+            term for term, numbers in self.postings.items()
+            if self._changes.get(term, {}).get(number, padded in f" {numbers} ")
+        ]
+    
+    def to_dict(self) -> Dict:
+        """Convert the index to a dictionary to store, folding in the changes."""
+        for term in self._changes:
+            numbers = sorted(self._numbers_of(term))
+            if numbers:
+                self.postings[term] = " ".join(map(str, numbers))
+            else:
+                del self.postings[term]
+        self._changes.clear()
+        
+        if len(self.numbers) * 2 < len(self.ids):
+            self._renumber()
+        
+        return {"ids": self.ids, "terms": self.postings}
+    
+    def _renumber(self) -> None:
+        """Number the notes left in order, rewriting every posting list."""
+        live = [note_id for note_id in self.ids if note_id is not None]
+        renumbered = {
+            self.numbers[note_id]: str(number) for number, note_id in enumerate(live)
+        }
+        
+        # Numbers keep their order, so the lists stay sorted
+        postings = {}
+        for term, numbers in self.postings.items():
+            kept = [
+                renumbered[number] for number in map(int, numbers.split())
+                if number in renumbered
+            ]
+            if kept:
+                postings[term] = " ".join(kept)
+        
+        self.postings = postings
+        self.ids = live
+        self.numbers = {note_id: number for number, note_id in enumerate(live)}
+
+
 class NoteManager:
     """Manages notes storage and operations."""
     
@@ -72,61 +477,280 @@ class NoteManager:
             storage_dir = os.path.join(agentic_home, "shared", "notes")
             
         self.storage_dir = pathlib.Path(storage_dir)
-        self.storage_dir.mkdir(parents=True, exist_ok=True)
+        if not self.storage_dir.is_dir():
+            self.storage_dir.mkdir(parents=True, exist_ok=True)
         self.index_file = self.storage_dir / "index.json"
-        self._load_index()
+        self.terms_file = self.storage_dir / "terms.json"
+        self._batch_depth = 0
+        self._dirty = False
+        self._index: Optional[Dict[str, Dict]] = None
+        self._terms: Optional[_TermIndex] = None
+        self._stamp: Optional[FileStamp] = None
+        _MANAGERS.add(self)
+    
+    @property
+    def index(self) -> Dict[str, Dict]:
+        """Metadata of each note by ID, loaded from disk on first use."""
+        if self._index is None:
+            self._load_index()
+        return self._index
+    
+    @property
+    def terms(self) -> _TermIndex:
+        """
+        IDs of the notes containing each search term.
+        
+        The terms have a file of their own, loaded on first use, so listing
+        and viewing notes never pays for reading them.
+        """
+        if self._terms is None:
+            self._load_terms()
+        return self._terms
     
     def _load_index(self) -> None:
-        """Load the note index from disk."""
-        if self.index_file.exists():
-            with open(self.index_file, "r", encoding="utf-8") as f:
-                self.index = json.load(f)
-        else:
-            self.index = {}
+        """Load the note index from disk, leaving the search terms for later."""
+        self._stamp = _file_stamp(self.index_file)
+        self._terms = None
+        if self._stamp is None:
+            self._index = {}
+            self._terms = _TermIndex()
             self._save_index()
+        else:
+            index = _read_json(self.index_file)
+            if all("title_lc" in note_info for note_info in index.values()):
+                self._index = index
+            else:
+                self._upgrade_index(index)
+    
+    def _load_terms(self) -> None:
+        """
+        Load the search terms from disk, matching the loaded index.
+        
+        The terms file records the index file it was written with. Terms
+        written with another one, as when a process crashed between writing
+        the two, are rebuilt from the note files instead.
+        """
+        if self._index is None:
+            self._load_index()
+            if self._terms is not None:
+                return
+        
+        try:
+            data = _read_json(self.terms_file)
+        except FileNotFoundError:
+            data = {}
+        current = self._stamp is not None and data.get("index") == list(self._stamp)
+        if not current:
+            self._build_terms()
+            if not self._dirty:
+                self._write_terms()
+            return
+        
+        self._terms = _TermIndex(data["terms"], data["ids"])
+    
+    def _upgrade_index(self, data: Dict[str, Dict]) -> None:
+        """
+        Load an index written by a version without search terms.
+        
+        Such indexes are in no particular order and lack the lowercased
+        titles, so both are put right in memory, and saved with the next
+        change. Nothing is written meanwhile, so commands that only read stay
+        as fast as before; the terms are built by the first search.
+        """
+        by_update = sorted(data.items(), key=lambda item: item[1]["updated_at"])
+        self._index = dict(by_update)
+        for note_info in self._index.values():
+            note_info["title_lc"] = note_info["title"].lower()
+    
+    def _build_terms(self) -> None:
+        """Build the search terms of the indexed notes from their files."""
+        self._terms = _TermIndex()
+        for note_id in self.index:
+            note = self.get_note(note_id)
+            if note is not None:
+                self._terms.add(note_id, self._note_terms(note))
     
     def _save_index(self) -> None:
-        """Save the note index to disk."""
-        with open(self.index_file, "w", encoding="utf-8") as f:
-            json.dump(self.index, f, indent=2)
+        """Save the note index to disk, or defer it while a batch is open."""
+        if self._batch_depth:
+            self._dirty = True
+            return
+        
+        self._write_index()
+    
+    def _write_index(self) -> None:
+        """Write the whole index, and its search terms if they are loaded."""
+        _write_json(self.index_file, self.index)
+        self._stamp = _file_stamp(self.index_file)
+        if self._terms is not None:
+            self._write_terms()
+        self._dirty = False
+    
+    def _write_terms(self) -> None:
+        """Write the search terms, stamped with the index file they go with."""
+        _write_json(
+            self.terms_file, {"index": self._stamp, **self._terms.to_dict()},
+            indent=False
+        )
+    
+    def flush(self) -> None:
+        """Write the index changes that were deferred, if any."""
+        if self._dirty:
+            self._write_index()
+    
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """
+        Defer index writes until the end of the block.
+        
+        However many notes are changed inside the block, the index is written
+        once on exit. Batches may be nested; only the outermost one writes.
+        """
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self.flush()
+    
+    def _changed_on_disk(self) -> bool:
+        """Check whether the index file was rewritten since this manager read it."""
+        return self._index is not None and _file_stamp(self.index_file) != self._stamp
+    
+    def _kept_terms(self) -> Optional[_TermIndex]:
+        """
+        Get the search terms to update along with the index.
+        
+        Returns None if they were never built, leaving that to the first
+        search rather than the change at hand.
+        """
+        if self._terms is None and not self.terms_file.exists():
+            return None
+        return self.terms
     
     def _get_note_path(self, note_id: str) -> pathlib.Path:
         """Get the file path for a note."""
         return self.storage_dir / f"{note_id}.json"
     
+    def _read_note_data(self, note_id: str) -> Optional[Dict]:
+        """Read the stored data of a note."""
+        if note_id not in self.index:
+            return None
+        
+        # Opening straight away saves a separate existence check
+        try:
+            return _read_json(self._get_note_path(note_id))
+        except FileNotFoundError:
+            return None
+    
+    def _rules_out_content(self, note_id: str, pattern: "re.Pattern[bytes]") -> bool:
+        """
+        Check the raw bytes of a note file to rule out a content match.
+        
+        The file is memory-mapped and searched without being parsed. Returns
+        True only if pattern, from _content_pattern, is found nowhere in it,
+        so the content cannot match.
+        """
+        try:
+            with open(self._get_note_path(note_id), "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    return pattern.search(mm) is None
+        except (FileNotFoundError, ValueError):
+            # Missing and empty files are left for the regular read to handle
+            return False
+    
+    def _write_note(self, note: Note) -> None:
+        """Save a note to disk."""
+        _write_json(self._get_note_path(note.id), note.to_dict())
+    
+    @staticmethod
+    def _summary(note_id: str, note_info: Dict) -> Dict:
+        """Get the metadata of a note as returned by listings and searches."""
+        return {
+            "id": note_id,
+            "title": note_info["title"],
+            "tags": note_info["tags"],
+            "created_at": note_info["created_at"],
+            "updated_at": note_info["updated_at"]
+        }
+    
+    @staticmethod
+    def _note_terms(note: Note) -> Set[str]:
+        """Get the search terms of a note's title and content."""
+        return _tokenize(f"{note.title}\n{note.content}")
+    
+    def _term_matches(self, words: Set[str]) -> Dict[str, Set[str]]:
+        """
+        Get the IDs of the notes with a term containing each of the words.
+        
+        The terms are joined into lines of one text, scanned once however many
+        words there are, and each occurrence is traced back to its term.
+        """
+        matches: Dict[str, Set[str]] = {word: set() for word in words}
+        if not words:
+            return matches
+        
+        vocabulary = self.terms.vocabulary()
+        lengths = (len(term) + 1 for term in vocabulary)
+        starts = list(itertools.accumulate(lengths, initial=0))
+        found = {
+            (word, bisect.bisect_right(starts, end) - 1)
+            for end, word in _substring_finder(words)("\n".join(vocabulary))
+        }
+        for word, position in found:
+            matches[word].update(self.terms.get(vocabulary[position], ()))
+        
+        return matches
+    
+    def _search_candidates(
+        self, query: str, matches: Optional[Dict[str, Set[str]]] = None
+    ) -> Optional[Set[str]]:
+        """
+        Get the IDs of the notes that may contain query.
+        
+        Every word of the query must be part of some term of a matching note,
+        so this intersects the notes with terms containing each word, taken
+        from matches when given. Returns None if no word can narrow the
+        search down.
+        """
+        words = _query_words(query)
+        if not words:
+            return None
+        
+        if matches is None:
+            matches = self._term_matches(words)
+        return set.intersection(*(matches[word] for word in words))
+    
     def create_note(self, title: str, content: str, tags: Optional[List[str]] = None) -> Note:
         """Create a new note."""
         note = Note(title=title, content=content, tags=tags)
         
         # Save the note to disk
         if note.id is not None:  # This should always be true due to __post_init__
-            note_path = self._get_note_path(note.id)
-            with open(note_path, "w", encoding="utf-8") as f:
-                json.dump(note.to_dict(), f, indent=2)
+            self._write_note(note)
         
         # Update the index
         self.index[note.id] = {
             "title": note.title,
+            "title_lc": note.title.lower(),
             "tags": note.tags,
             "created_at": note.created_at,
             "updated_at": note.updated_at
         }
+        terms = self._kept_terms()
+        if terms is not None:
+            terms.add(note.id, self._note_terms(note))
         self._save_index()
         
         return note
     
     def get_note(self, note_id: str) -> Optional[Note]:
         """Get a note by ID."""
-        if note_id not in self.index:
-            return None
-        
-        note_path = self._get_note_path(note_id)
-        if not note_path.exists():
+        note_data = self._read_note_data(note_id)
+        if note_data is None:
             return None
         
-        with open(note_path, "r", encoding="utf-8") as f:
-            note_data = json.load(f)
-            
         return Note.from_dict(note_data)
     
     def update_note(self, note_id: str, title: Optional[str] = None, 
@@ -136,18 +760,25 @@ class NoteManager:
         if note is None:
             return None
         
+        old_terms = self._note_terms(note)
         note.update(title=title, content=content, tags=tags)
+        new_terms = self._note_terms(note)
         
         # Save the updated note to disk
         if note.id is not None:  # This should always be true for an existing note
-            note_path = self._get_note_path(note.id)
-            with open(note_path, "w", encoding="utf-8") as f:
-                json.dump(note.to_dict(), f, indent=2)
+            self._write_note(note)
         
-        # Update the index
-        self.index[note.id]["title"] = note.title
-        self.index[note.id]["tags"] = note.tags
-        self.index[note.id]["updated_at"] = note.updated_at
+        # Update the index, moving the note to the end as the latest updated
+        note_info = self.index.pop(note.id)
+        note_info["title"] = note.title
+        note_info["title_lc"] = note.title.lower()
+        note_info["tags"] = note.tags
+        note_info["updated_at"] = note.updated_at
+        self.index[note.id] = note_info
+        terms = self._kept_terms()
+        if terms is not None:
+            terms.remove(note.id, old_terms - new_terms)
+            terms.add(note.id, new_terms - old_terms)
         self._save_index()
         
         return note
@@ -157,9 +788,21 @@ class NoteManager:
         if note_id not in self.index:
             return False
         
-        note_path = self._get_note_path(note_id)
-        if note_path.exists():
-            note_path.unlink()
+        # Without the note file, look for the note in every posting list
+        terms = self._kept_terms()
+        if terms is not None:
+            note = self.get_note(note_id)
+            if note is not None:
+                note_terms = list(self._note_terms(note))
+            else:
+                note_terms = terms.terms_of(note_id)
+            terms.remove(note_id, note_terms)
+            terms.forget(note_id)
+        
+        try:
+            self._get_note_path(note_id).unlink()
+        except FileNotFoundError:
+            pass
         
         del self.index[note_id]
         self._save_index()
@@ -168,45 +811,113 @@ class NoteManager:
     
     def list_notes(self, tag: Optional[str] = None) -> List[Dict]:
         """List all notes, optionally filtered by tag."""
-        notes = []
-        
-        for note_id, note_info in self.index.items():
-            if tag is None or tag in note_info["tags"]:
-                notes.append({
-                    "id": note_id,
-                    **note_info
-                })
-        
-        # Sort by updated_at (newest first)
-        notes.sort(key=lambda x: x["updated_at"], reverse=True)
-        
-        return notes
+        # The index is kept in order of last update, so walk it backwards to
+        # list the newest first
+        return [
+            {
+                "id": note_id,
+                "title": note_info["title"],
+                "tags": note_info["tags"],
+                "created_at": note_info["created_at"],
+                "updated_at": note_info["updated_at"]
+            }
+            for note_id, note_info in reversed(self.index.items())
+            if tag is None or tag in note_info["tags"]
+        ]
     
     def search_notes(self, query: str) -> List[Dict]:
         """Search notes by title and content."""
         query = query.lower()
+        pattern = _content_pattern(query)
         results = []
         
-        for note_id, note_info in self.index.items():
+        # Only notes sharing terms with the query can match it
+        candidates = self._search_candidates(query)
+        note_ids = self.index if candidates is None else candidates
+        
+        for note_id in note_ids:
+            note_info = self.index[note_id]
+            
             # Check if query matches title
-            if query in note_info["title"].lower():
-                results.append({
-                    "id": note_id,
-                    **note_info,
-                    "matched": "title"
-                })
+            title_lc = note_info.get("title_lc")
+            if title_lc is None:
+                title_lc = note_info["title"].lower()
+            if query in title_lc:
+                summary = self._summary(note_id, note_info)
+                results.append({**summary, "matched": "title"})
                 continue
             
-            # Check if query matches content
-            note = self.get_note(note_id)
-            if note and query in note.content.lower():
-                results.append({
-                    "id": note_id,
-                    **note_info,
-                    "matched": "content"
-                })
+            # Check if query matches content, parsing only notes that may match
+            if pattern is not None:
+                if self._rules_out_content(note_id, pattern):
+                    continue
+            note_data = self._read_note_data(note_id)
+            if note_data is None:
+                continue
+            if query in note_data["content"].lower():
+                summary = self._summary(note_id, note_info)
+                results.append({**summary, "matched": "content"})
         
         # Sort by updated_at (newest first)
         results.sort(key=lambda x: x["updated_at"], reverse=True)
         
         return results
+    
+    def search_notes_batch(self, queries: List[str]) -> Dict[str, List[Dict]]:
+        """
+        Search notes by title and content for several queries at once.
+        
+        Each note is read at most once, however many queries it may match.
+        Returns the results of search_notes for each query.
+        """
+        lowered = {query: query.lower() for query in queries}
+        patterns = set(lowered.values())
+        matcher = _substring_matcher(patterns)
+        results: Dict[str, List[Dict]] = {pattern: [] for pattern in patterns}
+        
+        # Only notes sharing terms with a query can match it, and the terms
+        # are scanned once for the words of every query
+        matches = self._term_matches(set().union(*map(_query_words, patterns)))
+        wanted: Dict[str, Set[str]] = {}
+        unnarrowed = set()
+        for pattern in patterns:
+            candidates = self._search_candidates(pattern, matches)
+            if candidates is None:
+                unnarrowed.add(pattern)
+                continue
+            for note_id in candidates:
+                wanted.setdefault(note_id, set()).add(pattern)
+        note_ids = self.index if unnarrowed else wanted
+        
+        for note_id in note_ids:
+            note_info = self.index[note_id]
+            pending = unnarrowed | wanted.get(note_id, set())
+            
+            # Check which queries match the title
+            title_lc = note_info.get("title_lc")
+            if title_lc is None:
+                title_lc = note_info["title"].lower()
+            matched = matcher(title_lc) & pending
+            if matched:
+                summary = self._summary(note_id, note_info)
+                for pattern in matched:
+                    results[pattern].append({**summary, "matched": "title"})
+                pending -= matched
+            if not pending:
+                continue
+            
+            # Check the remaining queries against the content
+            note_data = self._read_note_data(note_id)
+            if note_data is None:
+                continue
+            matched = matcher(note_data["content"].lower()) & pending
+            if matched:
+                summary = self._summary(note_id, note_info)
+                for pattern in matched:
+                    results[pattern].append({**summary, "matched": "content"})
+        
+        # Sort by updated_at (newest first)
+        for pattern_results in results.values():
+            pattern_results.sort(key=lambda x: x["updated_at"], reverse=True)
+        
+        return {query: list(results[lowered[query]]) for query in queries}
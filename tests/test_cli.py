@@ -4,13 +4,22 @@ Tests for the CLI module.
 
 import argparse
 import io
+import os
+import subprocess
 import sys
 import tempfile
 import unittest
 from pathlib import Path
 from unittest.mock import patch
 
-from agentic_note.cli import create_parser, main, parse_tags
+from agentic_note import cli
+from agentic_note.cli import (
+    _sniff_subcommand,
+    create_help_parser,
+    create_parser,
+    main,
+    parse_tags,
+)
 from agentic_note.note import Note, NoteManager
 
 
@@ -21,6 +30,80 @@ class TestCLI(unittest.TestCase):
         """Test creating the argument parser."""
         parser = create_parser()
         self.assertIsInstance(parser, argparse.ArgumentParser)
+        self.assertTrue(
+            parser.epilog.startswith("\nExamples:\n  # Create a new note\n")
+        )
+    
+    def test_create_parser_only(self):
+        """Test building the parser for a single command."""
+        parser = create_parser(only="view")
+        args = parser.parse_args(["view", "note-id"])
+        self.assertEqual(args.command, "view")
+        self.assertEqual(args.id, "note-id")
+        
+        # Other commands are not registered
+        with patch("sys.stderr", new_callable=io.StringIO):
+            with self.assertRaises(SystemExit):
+                parser.parse_args(["list"])
+    
+    def test_create_help_parser(self):
+        """Test that the help parser prints the same help as the full parser."""
+        self.assertEqual(create_help_parser().format_help(),
+                         create_parser().format_help())
+    
+    @patch("sys.stdout", new_callable=io.StringIO)
+    @patch("agentic_note.cli.create_parser")
+    def test_main_help(self, mock_create_parser, mock_stdout):
+        """Test printing help without building the full parser."""
+        with patch("sys.argv", ["ag-note", "--help"]):
+            self.assertEqual(main(), 0)
+        with patch("sys.argv", ["ag-note"]):
+            self.assertEqual(main(), 1)
+        
+        mock_create_parser.assert_not_called()
+        self.assertIn("Create a new note", mock_stdout.getvalue())
+    
+    def test_sniff_subcommand(self):
+        """Test finding the command in the arguments."""
+        self.assertEqual(_sniff_subcommand(["create", "Title", "list"]), "create")
+        self.assertEqual(_sniff_subcommand(["search", "--help"]), "search")
+        self.assertIsNone(_sniff_subcommand([]))
+        self.assertIsNone(_sniff_subcommand(["--help"]))
+        self.assertIsNone(_sniff_subcommand(["-h", "create"]))
+        self.assertIsNone(_sniff_subcommand(["unknown"]))
+        self.assertIsNone(_sniff_subcommand(["bogus", "list"]))
+    
+    def test_invalid_command_lists_every_command(self):
+        """Test that a mistake before a command name is reported in full."""
+        with patch("sys.stderr", new_callable=io.StringIO) as mock_stderr:
+            with self.assertRaises(SystemExit):
+                cli._run(["bogus", "list"])
+        
+        self.assertIn(
+            "(choose from 'create', 'list', 'view', 'update', 'delete', 'search')",
+            mock_stderr.getvalue()
+        )
+    
+    def test_help_does_not_import_note_module(self):
+        """Test that printing help leaves the note module unimported."""
+        src_dir = Path(__file__).parent.parent / "src"
+        env = dict(os.environ, PYTHONPATH=str(src_dir))
+        code = (
+            "import sys\n"
+            "from agentic_note import cli\n"
+            "try:\n"
+            "    cli.create_parser().parse_args(['--help'])\n"
+            "except SystemExit:\n"
+            "    pass\n"
+            "sys.stderr.write(str('agentic_note.note' in sys.modules))\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(result.stderr, "False")
     
     def test_parse_tags(self):
         """Test parsing tags."""
@@ -48,6 +131,7 @@ class TestCLICommands(unittest.TestCase):
         """Set up a temporary directory for testing."""
         self.temp_dir = tempfile.TemporaryDirectory()
         self.storage_dir = Path(self.temp_dir.name)
+        cli._MANAGER_CACHE.clear()
         
         # Create a test note
         self.note_manager = NoteManager(self.storage_dir)
@@ -59,10 +143,49 @@ class TestCLICommands(unittest.TestCase):
     
     def tearDown(self):
         """Clean up the temporary directory."""
+        cli._MANAGER_CACHE.clear()
         self.temp_dir.cleanup()
     
+    def test_get_manager(self):
+        """Test reusing the note manager of a storage directory."""
+        note_manager = cli._get_manager(str(self.storage_dir))
+        self.assertIn(self.test_note.id, note_manager.index)
+        
+        # The loaded index is kept while the index file is unchanged
+        with patch("agentic_note.note._read_json", side_effect=AssertionError):
+            self.assertIs(cli._get_manager(str(self.storage_dir)), note_manager)
+            note_manager.list_notes()
+        
+        # Changes made by another manager are picked up
+        other_note = self.note_manager.create_note("Other Note", "More content.")
+        self.assertIn(other_note.id, cli._get_manager(str(self.storage_dir)).index)
+    
+    def test_storage_dir_follows_home(self):
+        """Test that the default notes directory follows HOME as it changes."""
+        for home in ("/home/a", "/home/b"):
+            with patch.dict(os.environ, {"HOME": home}):
+                self.assertEqual(cli._storage_dir(None),
+                                 os.path.join(home, "Agentic", "shared", "notes"))
+    
+    @patch("sys.stdout", new_callable=io.StringIO)
+    def test_commands_share_manager(self, mock_stdout):
+        """Test running several commands against one storage directory."""
+        agentic_home = self.storage_dir / "home"
+        with patch.dict(os.environ, {"AGHOME": str(agentic_home)}):
+            create = ["ag-note", "create", "Title", "Body", "--tags", "x"]
+            with patch("sys.argv", create):
+                self.assertEqual(main(), 0)
+            with patch("sys.argv", ["ag-note", "list", "--tag", "x"]):
+                self.assertEqual(main(), 0)
+        
+        output = mock_stdout.getvalue()
+        self.assertIn("Note created with ID:", output)
+        self.assertIn("Title: Title", output)
+        self.assertEqual(list(cli._MANAGER_CACHE),
+                         [str(agentic_home / "shared" / "notes")])
+    
     @patch("sys.stdout", new_callable=io.StringIO)
-    @patch("agentic_note.cli.NoteManager")
+    @patch("agentic_note.note.NoteManager")
     def test_create_command(self, mock_note_manager_class, mock_stdout):
         """Test the create command."""
         # Mock the NoteManager instance
@@ -85,7 +208,7 @@ class TestCLICommands(unittest.TestCase):
         self.assertIn(f"Note created with ID: {mock_note.id}", mock_stdout.getvalue())
     
     @patch("sys.stdout", new_callable=io.StringIO)
-    @patch("agentic_note.cli.NoteManager")
+    @patch("agentic_note.note.NoteManager")
     def test_list_command(self, mock_note_manager_class, mock_stdout):
         """Test the list command."""
         # Mock the NoteManager instance
@@ -124,7 +247,7 @@ class TestCLICommands(unittest.TestCase):
         self.assertIn("Tags: tag2, tag3", output)
     
     @patch("sys.stdout", new_callable=io.StringIO)
-    @patch("agentic_note.cli.NoteManager")
+    @patch("agentic_note.note.NoteManager")
     def test_view_command(self, mock_note_manager_class, mock_stdout):
         """Test the view command."""
         # Mock the NoteManager instance
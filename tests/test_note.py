@@ -2,13 +2,24 @@
 Tests for the Note class.
 """
 
+import gc
+import json
 import os
 import pathlib
+import sys
 import tempfile
 import uuid
-from unittest import TestCase
+import weakref
+from contextlib import nullcontext
+from unittest import TestCase, skipIf
+from unittest.mock import patch
 
-from agentic_note.note import Note, NoteManager
+from agentic_note.note import Note, NoteManager, _flush_managers, _read_json
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
 
 
 class TestNote(TestCase):
@@ -25,6 +36,18 @@ class TestNote(TestCase):
         self.assertIsNotNone(note.updated_at)
         self.assertIsNotNone(note.id)
     
+    def test_note_id(self):
+        """Test that note IDs are version 7 UUIDs ordered by creation time."""
+        time_ns = "agentic_note.note.time.time_ns"
+        with patch(time_ns, return_value=1_000_000_000_000_000):
+            first = Note(title="First", content="Created first.")
+        with patch(time_ns, return_value=1_000_000_001_000_000):
+            second = Note(title="Second", content="Created second.")
+        
+        self.assertEqual(uuid.UUID(first.id).version, 7)
+        self.assertEqual(uuid.UUID(first.id).variant, uuid.RFC_4122)
+        self.assertLess(first.id, second.id)
+    
     def test_note_update(self):
         """Test updating a note."""
         note = Note(title="Test Note", content="This is a test note.")
@@ -51,6 +74,17 @@ class TestNote(TestCase):
         self.assertIsNotNone(note_dict["created_at"])
         self.assertIsNotNone(note_dict["updated_at"])
         self.assertIsNotNone(note_dict["id"])
+        
+        # The dictionary does not share the tags list with the note
+        note_dict["tags"].append("tag2")
+        self.assertEqual(note.tags, ["tag1"])
+    
+    @skipIf(sys.version_info < (3, 10), "slotted dataclasses need Python 3.10")
+    def test_note_slots(self):
+        """Test that notes do not carry an instance dictionary."""
+        note = Note(title="Test Note", content="This is a test note.")
+        
+        self.assertFalse(hasattr(note, "__dict__"))
     
     def test_note_from_dict(self):
         """Test creating a note from a dictionary."""
@@ -71,6 +105,15 @@ class TestNote(TestCase):
         self.assertEqual(note.created_at, "2025-03-15T12:00:00")
         self.assertEqual(note.updated_at, "2025-03-15T12:00:00")
         self.assertEqual(note.id, note_dict["id"])
+    
+    def test_note_from_dict_keeps_clock_untouched(self):
+        """Test that loading a note with timestamps does not read the clock."""
+        note_dict = Note(title="Test Note", content="This is a test note.").to_dict()
+        
+        with patch("agentic_note.note.datetime") as mock_datetime:
+            Note.from_dict(note_dict)
+        
+        mock_datetime.datetime.now.assert_not_called()
 
 
 class TestNoteManager(TestCase):
@@ -86,6 +129,16 @@ class TestNoteManager(TestCase):
         """Clean up the temporary directory."""
         self.temp_dir.cleanup()
     
+    def write_index_file(self, data):
+        """Replace the index file, as another process would."""
+        with open(self.storage_dir / "index.json", "w", encoding="utf-8") as f:
+            json.dump(data, f)
+    
+    def write_legacy_index_file(self, data):
+        """Replace the index with one written before the terms file existed."""
+        self.write_index_file(data)
+        (self.storage_dir / "terms.json").unlink(missing_ok=True)
+    
     def test_create_note(self):
         """Test creating a note."""
         note = self.note_manager.create_note(
@@ -205,6 +258,14 @@ class TestNoteManager(TestCase):
         
         self.assertEqual(len(notes), 1)
         self.assertEqual(notes[0]["id"], note1.id)
+        
+        # Notes are listed newest first, by last update
+        notes = self.note_manager.list_notes()
+        self.assertEqual([note["id"] for note in notes], [note2.id, note1.id])
+        
+        self.note_manager.update_note(note1.id, content="Updated content")
+        notes = self.note_manager.list_notes()
+        self.assertEqual([note["id"] for note in notes], [note1.id, note2.id])
     
     def test_search_notes(self):
         """Test searching notes."""
@@ -237,3 +298,385 @@ class TestNoteManager(TestCase):
         results = self.note_manager.search_notes("sugar")
         
         self.assertEqual(len(results), 2)
+        
+        # Search by part of a word and across words
+        results = self.note_manager.search_notes("ples, SUG")
+        
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]["id"], note1.id)
+        self.assertEqual(results[0]["matched"], "content")
+        
+        # Search by a stopword
+        results = self.note_manager.search_notes("an")
+        
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]["id"], note2.id)
+    
+    def test_search_notes_batch(self):
+        """Test searching notes for several queries at once."""
+        self.note_manager.create_note(
+            title="Apple Pie Recipe",
+            content="Ingredients: apples, sugar, flour"
+        )
+        self.note_manager.create_note(
+            title="Banana Bread",
+            content="Ingredients: bananas, sugar, flour"
+        )
+        queries = ["apple", "Sugar", "ples, SUG", "an", "cherry", ""]
+        
+        for matcher in (ahocorasick, None):
+            with self.subTest(ahocorasick=matcher is not None):
+                with patch.dict(sys.modules, {"ahocorasick": matcher}):
+                    results = self.note_manager.search_notes_batch(queries)
+                
+                self.assertEqual(list(results), queries)
+                for query in queries:
+                    self.assertEqual(
+                        results[query], self.note_manager.search_notes(query)
+                    )
+        
+        # The terms are scanned once for the words of every query
+        with patch.object(self.note_manager, "_term_matches",
+                          wraps=self.note_manager._term_matches) as term_matches:
+            self.note_manager.search_notes_batch(queries)
+        words = {"apple", "sugar", "ples", "sug", "cherry"}
+        term_matches.assert_called_once_with(words)
+    
+    def test_search_terms(self):
+        """Test keeping the search terms up to date."""
+        note = self.note_manager.create_note(
+            title="Apple Pie",
+            content="The apples are sweet"
+        )
+        
+        self.assertEqual(self.note_manager.terms["apple"], [note.id])
+        self.assertEqual(self.note_manager.terms["apples"], [note.id])
+        self.assertNotIn("the", self.note_manager.terms)
+        
+        # Updating the note replaces its terms
+        self.note_manager.update_note(note.id, content="Sour cherries")
+        
+        self.assertIn("cherries", self.note_manager.terms)
+        self.assertNotIn("apples", self.note_manager.terms)
+        self.assertEqual(self.note_manager.search_notes("sweet"), [])
+        
+        # Terms are saved with the index
+        reloaded = NoteManager(self.storage_dir)
+        self.assertEqual(reloaded.terms, self.note_manager.terms)
+        
+        # Deleting the note drops its terms
+        self.note_manager.delete_note(note.id)
+        
+        self.assertEqual(self.note_manager.terms, {})
+    
+    def test_terms_change_after_loading(self):
+        """Test changing search terms loaded from disk, then storing them."""
+        note1 = self.note_manager.create_note("Apple", "Sweet apples")
+        note2 = self.note_manager.create_note("Apple", "Sour apples")
+        
+        reloaded = NoteManager(self.storage_dir)
+        reloaded.update_note(note1.id, title="Pear")
+        reloaded.delete_note(note2.id)
+        
+        self.assertEqual(reloaded.terms["pear"], [note1.id])
+        self.assertEqual(reloaded.terms["apples"], [note1.id])
+        self.assertNotIn("apple", reloaded.terms)
+        self.assertNotIn("sour", reloaded.terms)
+        
+        terms_data = _read_json(self.storage_dir / "terms.json")
+        self.assertEqual(terms_data["ids"], [note1.id, None])
+        self.assertEqual(terms_data["terms"],
+                         {"apples": "0", "pear": "0", "sweet": "0"})
+    
+    def test_terms_renumber_after_deletes(self):
+        """Test that deleted notes stop taking up numbers once they dominate."""
+        with self.note_manager.batch():
+            notes = [
+                self.note_manager.create_note(f"Note {i}", f"Apple item{i}")
+                for i in range(10)
+            ]
+            for note in notes[:-2]:
+                self.note_manager.delete_note(note.id)
+        
+        terms_data = _read_json(self.storage_dir / "terms.json")
+        self.assertEqual(terms_data["ids"], [notes[8].id, notes[9].id])
+        self.assertEqual(terms_data["terms"]["apple"], "0 1")
+        self.assertEqual(terms_data["terms"]["item9"], "1")
+        self.assertNotIn("item0", terms_data["terms"])
+        
+        reloaded = NoteManager(self.storage_dir)
+        results = reloaded.search_notes("apple item9")
+        self.assertEqual([result["id"] for result in results], [notes[9].id])
+        
+        # Notes added afterwards take the next number
+        note = reloaded.create_note("Pear", "Sweet")
+        self.assertEqual(reloaded.terms["pear"], [note.id])
+        apple = reloaded.terms["apple"]
+        self.assertEqual(sorted(apple), sorted([notes[8].id, notes[9].id]))
+    
+    def test_load_index_without_terms(self):
+        """Test loading an index written before search terms were added."""
+        note = self.note_manager.create_note("Banana Bread", "Bake for an hour")
+        
+        self.write_legacy_index_file(self.note_manager.index)
+        
+        index_bytes = (self.storage_dir / "index.json").read_bytes()
+        
+        # Reading commands upgrade the index in memory only
+        reloaded = NoteManager(self.storage_dir)
+        self.assertEqual(reloaded.index, self.note_manager.index)
+        self.assertEqual(reloaded.list_notes()[0]["id"], note.id)
+        self.assertEqual((self.storage_dir / "index.json").read_bytes(), index_bytes)
+        self.assertFalse((self.storage_dir / "terms.json").exists())
+        
+        # The first search builds the terms and stores them
+        self.assertEqual(reloaded.search_notes("bake")[0]["id"], note.id)
+        self.assertEqual(reloaded.terms["hour"], [note.id])
+        self.assertTrue((self.storage_dir / "terms.json").exists())
+    
+    def test_index_changed_by_older_version(self):
+        """Test loading an index an older version added a note to."""
+        note1 = self.note_manager.create_note("Apple Pie", "Sweet apples")
+        note2 = self.note_manager.create_note("Banana Bread", "Ripe bananas")
+        self.note_manager.search_notes("apples")
+        
+        # Older versions update entries in place and know nothing of the terms
+        index = _read_json(self.storage_dir / "index.json")
+        index[note1.id] = {**index[note1.id], "updated_at": "2099-01-01T00:00:00"}
+        note3 = Note(title="Cherry Tart", content="Sour cherries")
+        (self.storage_dir / f"{note3.id}.json").write_text(json.dumps(note3.to_dict()))
+        index[note3.id] = {
+            "title": note3.title,
+            "tags": [],
+            "created_at": note3.created_at,
+            "updated_at": note3.updated_at
+        }
+        self.write_index_file(index)
+        
+        reloaded = NoteManager(self.storage_dir)
+        listed = [entry["id"] for entry in reloaded.list_notes()]
+        self.assertEqual(listed, [note1.id, note3.id, note2.id])
+        self.assertEqual(reloaded.search_notes("cherries")[0]["id"], note3.id)
+    
+    def test_load_index_without_terms_orders_by_update(self):
+        """Test that upgrading an older index orders it by last update."""
+        note1 = self.note_manager.create_note("Note 1", "Content 1")
+        note2 = self.note_manager.create_note("Note 2", "Content 2")
+        
+        index = self.note_manager.index
+        legacy_index = {
+            note2.id: {**index[note2.id], "updated_at": "2025-01-01T00:00:00"},
+            note1.id: {**index[note1.id], "updated_at": "2025-02-01T00:00:00"},
+        }
+        self.write_legacy_index_file(legacy_index)
+        
+        notes = NoteManager(self.storage_dir).list_notes()
+        self.assertEqual([note["id"] for note in notes], [note1.id, note2.id])
+    
+    def test_terms_load_only_for_search(self):
+        """Test that listing and viewing notes never read the search terms."""
+        note = self.note_manager.create_note("Apple Pie", "Sweet apples")
+        
+        reloaded = NoteManager(self.storage_dir)
+        with patch.object(reloaded, "_load_terms", side_effect=AssertionError):
+            reloaded.list_notes()
+            reloaded.get_note(note.id)
+        
+        self.assertEqual([r["id"] for r in reloaded.search_notes("sweet")], [note.id])
+    
+    def test_batch(self):
+        """Test that a batch writes the index once on exit."""
+        with patch.object(self.note_manager, "_write_index",
+                          wraps=self.note_manager._write_index) as write_index:
+            with self.note_manager.batch():
+                note1 = self.note_manager.create_note("Note 1", "Content 1")
+                with self.note_manager.batch():
+                    note2 = self.note_manager.create_note("Note 2", "Content 2")
+                self.note_manager.delete_note(note1.id)
+                
+                # Nothing has been written yet
+                write_index.assert_not_called()
+            
+            write_index.assert_called_once()
+        
+        # Check that the index on disk reflects every change
+        reloaded = NoteManager(self.storage_dir)
+        self.assertEqual(list(reloaded.index), [note2.id])
+    
+    def test_flush(self):
+        """Test flushing deferred index changes inside a batch."""
+        with self.note_manager.batch():
+            note = self.note_manager.create_note("Note", "Content")
+            self.note_manager.flush()
+            
+            reloaded = NoteManager(self.storage_dir)
+            self.assertIn(note.id, reloaded.index)
+    
+    def test_flush_at_exit(self):
+        """Test flushing deferred changes at exit without keeping managers alive."""
+        batch = self.note_manager.batch()
+        batch.__enter__()
+        note = self.note_manager.create_note("Note", "Content")
+        _flush_managers()
+        
+        reloaded = NoteManager(self.storage_dir)
+        self.assertIn(note.id, reloaded.index)
+        batch.__exit__(None, None, None)
+        
+        manager = NoteManager(self.storage_dir)
+        ref = weakref.ref(manager)
+        del manager
+        gc.collect()
+        self.assertIsNone(ref())
+    
+    def test_writes_leave_no_temporary_files(self):
+        """Test that atomic writes clean up after themselves."""
+        note = self.note_manager.create_note("Note", "Content")
+        self.note_manager.update_note(note.id, content="New content")
+        
+        names = [path.name for path in self.storage_dir.iterdir()]
+        self.assertIn("index.json", names)
+        self.assertIn(f"{note.id}.json", names)
+        self.assertFalse([name for name in names if name.endswith(".tmp")])
+    
+    def test_writes_use_temporary_files_of_their_own(self):
+        """Test that atomic writes leave other processes' temporary files be."""
+        other_tmp = self.storage_dir / "index.json.tmp"
+        other_tmp.write_bytes(b"{}")
+        self.note_manager.create_note("Note", "Content")
+        self.assertEqual(other_tmp.read_bytes(), b"{}")
+        
+        with patch("agentic_note.note.os.replace", side_effect=OSError):
+            with self.assertRaises(OSError):
+                self.note_manager.create_note("Note", "Content")
+        
+        names = [path.name for path in self.storage_dir.iterdir()]
+        self.assertEqual([name for name in names if name.endswith(".tmp")],
+                         ["index.json.tmp"])
+    
+    def test_stdlib_json_fallback(self):
+        """Test reading and writing notes without orjson."""
+        with patch("agentic_note.note.orjson", None):
+            note = self.note_manager.create_note("Café", "Crème brûlée", ["food"])
+            
+            reloaded = NoteManager(self.storage_dir)
+            retrieved_note = reloaded.get_note(note.id)
+        
+        self.assertEqual(retrieved_note.title, "Café")
+        self.assertEqual(retrieved_note.content, "Crème brûlée")
+        self.assertEqual(reloaded.index[note.id]["tags"], ["food"])
+    
+    def test_lone_surrogates(self):
+        """Test saving text decoded from arguments that are not valid UTF-8."""
+        title = b"Caf\xc3\xa9 \xff".decode("utf-8", "surrogateescape")
+        content = b"Cr\xc3\xa8me \xfe".decode("utf-8", "surrogateescape")
+        for writer in ("orjson", "json"):
+            with self.subTest(writer=writer):
+                json_patch = patch("agentic_note.note.orjson", None)
+                with json_patch if writer == "json" else nullcontext():
+                    note = self.note_manager.create_note(title, content, ["food"])
+                    self.note_manager.update_note(note.id, tags=["food", title])
+                    
+                    reloaded = NoteManager(self.storage_dir)
+                    retrieved_note = reloaded.get_note(note.id)
+                    listed = reloaded.list_notes(title)
+                    
+                    # Files that escape all text outside ASCII still
+                    # match other accented text
+                    results = reloaded.search_notes("crème")
+                
+                self.assertEqual(retrieved_note.title, title)
+                self.assertEqual(retrieved_note.content, content)
+                self.assertEqual(retrieved_note.tags, ["food", title])
+                self.assertIn(note.id, [entry["id"] for entry in listed])
+                self.assertIn(note.id, [result["id"] for result in results])
+    
+    def test_lowercase_caches(self):
+        """Test caching lowercased titles in the index, but not in note files."""
+        note = self.note_manager.create_note("Apple PIE", "Bake UNTIL Golden")
+        
+        self.assertEqual(self.note_manager.index[note.id]["title_lc"], "apple pie")
+        with open(self.storage_dir / f"{note.id}.json", "r", encoding="utf-8") as f:
+            self.assertEqual(json.load(f), note.to_dict())
+        
+        self.note_manager.update_note(note.id, title="Cherry PIE")
+        self.assertEqual(self.note_manager.index[note.id]["title_lc"], "cherry pie")
+        
+        # The cache stays internal
+        note = self.note_manager.get_note(note.id)
+        self.assertEqual(note.content, "Bake UNTIL Golden")
+        results = self.note_manager.search_notes("golden")
+        self.assertEqual(results[0]["matched"], "content")
+        self.assertNotIn("title_lc", results[0])
+        self.assertNotIn("title_lc", self.note_manager.list_notes()[0])
+    
+    def test_mutations_read_clock_once(self):
+        """Test that creating and updating a note each read the clock once."""
+        with patch("agentic_note.note.datetime") as mock_datetime:
+            mock_datetime.datetime.now.return_value.isoformat.return_value = (
+                "2025-03-15T12:00:00"
+            )
+            
+            note = self.note_manager.create_note("Note", "Content")
+            self.assertEqual(mock_datetime.datetime.now.call_count, 1)
+            
+            self.note_manager.update_note(note.id, content="New content")
+            self.assertEqual(mock_datetime.datetime.now.call_count, 2)
+    
+    def test_index_loads_on_first_use(self):
+        """Test that creating a manager leaves the index unread."""
+        self.note_manager.create_note("Note", "Content")
+        
+        reloaded = NoteManager(self.storage_dir)
+        self.assertIsNone(reloaded._index)
+        
+        self.assertEqual(len(reloaded.list_notes()), 1)
+        self.assertIsNotNone(reloaded._index)
+    
+    def test_search_content_skips_parsing(self):
+        """Test that notes whose files lack the query are not parsed."""
+        note1 = self.note_manager.create_note("Recipe", "Tart topped with apple")
+        note2 = self.note_manager.create_note("Recipe", "Apple tart")
+        
+        with patch("agentic_note.note._read_json", wraps=_read_json) as read_json:
+            results = self.note_manager.search_notes("APPLE TART")
+        
+        self.assertEqual([result["id"] for result in results], [note2.id])
+        read_json.assert_called_once_with(self.storage_dir / f"{note2.id}.json")
+        
+        # Queries with characters JSON escapes are checked the regular way
+        self.note_manager.update_note(note1.id, content='Say "cheese"')
+        results = self.note_manager.search_notes('"cheese"')
+        self.assertEqual([result["id"] for result in results], [note1.id])
+    
+    def test_search_content_lowercasing_to_ascii(self):
+        """Test that files with text lowercasing to ASCII are not ruled out."""
+        note1 = self.note_manager.create_note("Recipe", "Chill to 277 \u212a")
+        note2 = self.note_manager.create_note("Recipe", "D\u0130ner")
+        
+        results = self.note_manager.search_notes("277 k")
+        self.assertEqual([result["id"] for result in results], [note1.id])
+        results = self.note_manager.search_notes("di")
+        self.assertEqual([result["id"] for result in results], [note2.id])
+    
+    def test_missing_note_file(self):
+        """Test handling a note whose file has gone missing."""
+        note = self.note_manager.create_note("Note", "Content")
+        (self.storage_dir / f"{note.id}.json").unlink()
+        
+        self.assertIsNone(self.note_manager.get_note(note.id))
+        self.assertTrue(self.note_manager.delete_note(note.id))
+        self.assertNotIn(note.id, self.note_manager.index)
+    
+    def test_terms_from_another_index(self):
+        """Test rebuilding terms written along with a different index file."""
+        note = self.note_manager.create_note("Apple Pie", "Sweet apples")
+        
+        # As if a crash came between writing the index and terms files
+        stale_terms = {"index": [0, 0, 0], "terms": {}}
+        (self.storage_dir / "terms.json").write_text(json.dumps(stale_terms))
+        
+        reloaded = NoteManager(self.storage_dir)
+        self.assertEqual(reloaded.search_notes("sweet")[0]["id"], note.id)
+        terms_data = _read_json(self.storage_dir / "terms.json")
+        self.assertEqual(terms_data["terms"], reloaded.terms.to_dict()["terms"])